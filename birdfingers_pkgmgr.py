@@ -2,39 +2,143 @@
 # 🐦 Birdfingers Package Manager — web GUI with jobs, snapshots, preview/diff, and PyPI search
 # Works in venv or Windows embedded Python (python_embedded). Stdlib only.
 
-import sys, os, re, json, threading, webbrowser, urllib.parse, subprocess, logging, time, uuid, argparse
-from logging.handlers import RotatingFileHandler
+import sys, os, re, json, threading, webbrowser, urllib.parse, subprocess, logging, time, uuid, argparse, functools, atexit, queue, io, codecs, locale, gzip, hashlib
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # ---------- Env detection ----------
 
 def in_virtualenv():
     return (getattr(sys, "base_prefix", sys.prefix) != sys.prefix) or (os.environ.get("VIRTUAL_ENV") is not None)
 
+_EMBEDDED_PTH_RE = re.compile(r"python\d+\._pth", re.IGNORECASE)
+
 def _embedded_pth_path():
+    # single pass: pythonXY._pth wins, then python._pth, then any other *._pth
     exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+    plain = other = None
     try:
-        names = os.listdir(exe_dir)
+        with os.scandir(exe_dir) as it:
+            for entry in it:
+                name = entry.name.lower()
+                if _EMBEDDED_PTH_RE.fullmatch(name):
+                    return entry.path
+                if name == "python._pth":
+                    plain = entry.path
+                elif other is None and name.endswith("._pth"):
+                    other = entry.path
     except Exception:
         return None
-    for name in names:
-        if re.fullmatch(r"python\d+\._pth", name, flags=re.IGNORECASE):
-            return os.path.join(exe_dir, name)
-    p = os.path.join(exe_dir, "python._pth")
-    if os.path.exists(p): return p
-    for name in names:
-        if name.lower().endswith("._pth"):
-            return os.path.join(exe_dir, name)
-    return None
+    return plain or other
 
 def is_embedded_python():
     return os.name == "nt" and _embedded_pth_path() is not None
 
 # ---------- Pip helpers ----------
 
+# Long-lived interpreter that runs pip commands in-process, one JSON line per request.
+# fd 1/2 are pointed at a temp file for each command so output from pip and any
+# build subprocesses is captured; replies go out on a private dup of stdout.
+_PIP_WORKER_SRC = r"""
+import sys, os, json, tempfile
+proto = os.fdopen(os.dup(1), "w", encoding="utf-8")
+from pip._internal.cli.main import main
+proto.write("ready\n"); proto.flush()
+for line in sys.stdin:
+    try:
+        args = json.loads(line)["cmd"]
+    except Exception:
+        continue
+    with tempfile.TemporaryFile() as tmp:
+        sys.stdout.flush(); sys.stderr.flush()
+        saved = os.dup(1), os.dup(2)
+        os.dup2(tmp.fileno(), 1); os.dup2(tmp.fileno(), 2)
+        try:
+            rc = main(list(args))
+        except SystemExit as e:
+            rc = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException as e:
+            print(f"pip worker error: {e!r}"); rc = 1
+        finally:
+            sys.stdout.flush(); sys.stderr.flush()
+            os.dup2(saved[0], 1); os.dup2(saved[1], 2)
+            os.close(saved[0]); os.close(saved[1])
+        tmp.seek(0)
+        out = tmp.read().decode("utf-8", "replace")
+    proto.write(json.dumps({"rc": rc or 0, "out": out}) + "\n"); proto.flush()
+"""
+
+class PipWorker:
+    # commands after which the worker is recycled, since pip itself may have changed
+    RECYCLE = {"install", "uninstall", "download", "wheel"}
+
+    def __init__(self):
+        self.proc = None
+        self.key = None     # _site_key() when the worker started
+        self.broken = False
+        self.lock = threading.Lock()
+
+    def _spawn(self, key):
+        # captured output is decoded as UTF-8, so pip (and anything it spawns) must write
+        # UTF-8 rather than the ANSI code page a pipe gets on Windows
+        env = dict(os.environ, PYTHONIOENCODING="utf-8")
+        self.proc = subprocess.Popen([sys.executable, "-u", "-c", _PIP_WORKER_SRC],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, text=True, encoding="utf-8", env=env)
+        self.key = key
+        if self.proc.stdout.readline().strip() != "ready":
+            self._stop()
+            self.broken = True  # pip not importable; stay on the subprocess path until reset()
+            raise RuntimeError("pip worker failed to start")
+
+    def _stop(self):
+        p, self.proc = self.proc, None
+        if p is None: return
+        try:
+            p.stdin.close()
+            p.wait(timeout=5)
+        except Exception:
+            p.kill()
+
+    def run(self, args):
+        """Returns (returncode, output), or None if the worker is unavailable."""
+        with self.lock:
+            if self.broken: return None
+            try:
+                # pip caches installed-distribution metadata per process: restart once
+                # site-packages changed under it (jobs, or installs from outside)
+                key = _site_key()
+                if self.proc is not None and self.key != key:
+                    self._stop()
+                if self.proc is None or self.proc.poll() is not None:
+                    self._spawn(key)
+                self.proc.stdin.write(json.dumps({"cmd": list(args)}) + "\n")
+                self.proc.stdin.flush()
+                line = self.proc.stdout.readline()
+                if not line: raise EOFError("pip worker exited")
+                res = json.loads(line)
+            except Exception:
+                self._stop()
+                return None
+            if args and args[0] in self.RECYCLE:
+                self._stop()
+            return res["rc"], res["out"]
+
+    def reset(self):
+        with self.lock:
+            self._stop()
+            self.broken = False
+
+PIP_WORKER = PipWorker()
+atexit.register(PIP_WORKER.reset)
+
 def pip(*args):
     cmd = [sys.executable, "-m", "pip", *args]
+    res = PIP_WORKER.run(args)
+    if res is not None:
+        return subprocess.CompletedProcess(cmd, res[0], stdout=res[1])
     return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
 
 def ensure_pip():
@@ -45,6 +149,7 @@ def ensure_pip():
         import ensurepip  # type: ignore
         out = subprocess.run([sys.executable, "-m", "ensurepip", "--upgrade"],
                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        PIP_WORKER.reset()
         res2 = pip("--version")
         if res2.returncode == 0:
             return True, "Bootstrapped pip via ensurepip.\n" + (res2.stdout or "")
@@ -82,43 +187,298 @@ def enable_site_packages_in_embedded():
 
 # ---------- Package listing ----------
 
+# PEP 503 normalized names ("Foo_Bar" and "foo.bar" are both "foo-bar"); used as the key
+# wherever names from different sources are compared. Memoized, with a crude size cap.
+_NORM_RE = re.compile(r"[-_.]+")
+_NORM_CACHE = {}
+
+def norm(name):
+    v = _NORM_CACHE.get(name)
+    if v is None:
+        if len(_NORM_CACHE) > 10000: _NORM_CACHE.clear()
+        v = _NORM_CACHE[name] = _NORM_RE.sub("-", name).lower()
+    return v
+
 try:
     from importlib.metadata import distributions
 except ImportError:
     from importlib_metadata import distributions  # type: ignore
 
+_LIST_CACHE = {"key": None, "value": None, "json": None, "etag": None}
+_LIST_LOCK = threading.Lock()
+
+def _site_key():
+    # (dir, mtime) for every sys.path directory; installs/uninstalls touch these
+    key = []
+    for p in sys.path:
+        try:
+            st = os.stat(p or ".")
+        except OSError:
+            continue
+        key.append((p, st.st_mtime_ns))
+    return tuple(key)
+
+def invalidate_list_cache():
+    with _LIST_LOCK:
+        _LIST_CACHE["key"] = None
+
+def _pip_list():
+    # embedded/frozen layouts where importlib.metadata finds nothing: let pip look
+    res = pip("list", "--format=json", "--disable-pip-version-check")
+    if res.returncode != 0:
+        return []
+    for line in reversed((res.stdout or "").splitlines()):
+        if line.startswith("["):  # stdout and stderr are merged; skip any warnings
+            try:
+                return [{"name": d["name"], "version": d.get("version") or "unknown"}
+                        for d in json.loads(line) if d.get("name")]
+            except (ValueError, KeyError, TypeError):
+                break
+    return []
+
 def list_installed():
-    items = []
+    key = _site_key()
+    with _LIST_LOCK:
+        if _LIST_CACHE["key"] == key:
+            return _LIST_CACHE["value"]
+    items, seen = [], set()
     for dist in distributions():
         try:
             name = dist.metadata["Name"] or ""
         except Exception:
             name = getattr(dist, "project_name", "") or ""
         ver = dist.version or "unknown"
-        if name:
+        # a copy shadowed by an earlier sys.path entry is not the one that imports
+        if name and norm(name) not in seen:
+            seen.add(norm(name))
             items.append({"name": name, "version": ver})
+    if not items:
+        items = _pip_list()
     items.sort(key=lambda x: x["name"].lower())
+    with _LIST_LOCK:
+        _LIST_CACHE["key"], _LIST_CACHE["value"] = key, items
+        _LIST_CACHE["json"] = _LIST_CACHE["etag"] = None
     return items
 
-# ---------- PyPI query (stdlib only) ----------
+def list_installed_json():
+    """The /api/list body as (bytes, etag), serialised once per package-list rebuild."""
+    items = list_installed()
+    with _LIST_LOCK:
+        if _LIST_CACHE["value"] is items and _LIST_CACHE["json"] is not None:
+            return _LIST_CACHE["json"], _LIST_CACHE["etag"]
+    body = json.dumps({"packages": items}, separators=(",", ":")).encode("utf-8")
+    etag = _etag(body)
+    with _LIST_LOCK:
+        if _LIST_CACHE["value"] is items:
+            _LIST_CACHE["json"], _LIST_CACHE["etag"] = body, etag
+    return body, etag
+
+# ---------- PyPI query (stdlib only, cached on disk) ----------
 
-import urllib.request, urllib.error
+import urllib.request, urllib.error, http.client
+
+PYPI_CACHE_TTL = 600  # seconds before a cached PyPI response is revalidated
+
+def _pypi_cache_path(pkg):
+    safe = _SAFE_RE.sub("_", norm((pkg or "").strip())) or "_"
+    return os.path.join(PYPI_CACHE_DIR, safe + ".json")
+
+@functools.lru_cache(maxsize=64)
+def _load_pypi_cache(path, mtime_ns):
+    # keyed by mtime so a rewritten cache file is parsed once per process
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _read_pypi_cache(path):
+    try:
+        st = os.stat(path)
+        return st, _load_pypi_cache(path, st.st_mtime_ns)
+    except Exception:
+        return None, None
+
+def _write_pypi_cache(path, rec):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(rec, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _fresh_pypi_data(pkg):
+    st, cached = _read_pypi_cache(_pypi_cache_path(pkg))
+    if cached and time.time() - st.st_mtime < PYPI_CACHE_TTL:
+        return cached["data"]
+    return None
+
+# Idle keep-alive connections to pypi.org, so repeat lookups skip the TCP+TLS handshake.
+PYPI_HOST = "pypi.org"
+_PYPI_POOL = queue.LifoQueue()
+_PYPI_POOL_MAX = 4
+
+def _pypi_get_urllib(path, headers):
+    # proxied setups: http.client knows nothing about proxies, urllib does
+    req = urllib.request.Request(f"https://{PYPI_HOST}{path}", headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=15) as r:
+            return r.status, r.headers, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def _pypi_get_pooled(path, headers):
+    for attempt in (0, 1):
+        try:
+            conn, reused = (_PYPI_POOL.get_nowait(), True) if attempt == 0 else (None, False)
+        except queue.Empty:
+            conn, reused = None, False
+        if conn is None:
+            conn = http.client.HTTPSConnection(PYPI_HOST, timeout=15)
+        try:
+            conn.request("GET", path, headers=headers)
+            r = conn.getresponse()
+            body = r.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if reused: continue  # server dropped the idle connection; retry once on a fresh one
+            raise
+        if r.will_close or _PYPI_POOL.qsize() >= _PYPI_POOL_MAX:
+            conn.close()
+        else:
+            _PYPI_POOL.put(conn)
+        return r.status, r.headers, body
+
+def _pypi_get(path, headers):
+    """GET https://pypi.org<path> -> (status, headers, body), following one same-host redirect."""
+    get = _pypi_get_urllib if (urllib.request.getproxies().get("https")
+                               and not urllib.request.proxy_bypass(PYPI_HOST)) else _pypi_get_pooled
+    status, hdrs, body = get(path, headers)
+    if status in (301, 302, 303, 307, 308) and hdrs.get("Location"):
+        loc = urllib.parse.urlsplit(urllib.parse.urljoin(f"https://{PYPI_HOST}{path}", hdrs["Location"]))
+        if loc.netloc == PYPI_HOST:
+            status, hdrs, body = get(loc.path + (f"?{loc.query}" if loc.query else ""), headers)
+    if hdrs.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return status, hdrs, body
 
 def pypi_json(pkg):
-    url = f"https://pypi.org/pypi/{pkg}/json"
-    with urllib.request.urlopen(url, timeout=15) as r:
-        return json.load(r)
+    path = _pypi_cache_path(pkg)
+    st, cached = _read_pypi_cache(path)
+    if cached and time.time() - st.st_mtime < PYPI_CACHE_TTL:
+        return cached["data"]
+    url_path = f"/pypi/{urllib.parse.quote(pkg, safe='')}/json"
+    headers = {"Accept": "application/json", "Accept-Encoding": "gzip", "Connection": "keep-alive"}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        status, hdrs, body = _pypi_get(url_path, headers)
+    except (OSError, http.client.HTTPException) as e:
+        # offline or PyPI unreachable: an expired copy beats no answer
+        if not cached: raise
+        LOGGER.warning("PyPI unreachable for %s (%s); serving cached data", pkg, e)
+        return cached["data"]
+    if status >= 500 and cached:
+        LOGGER.warning("PyPI returned %s for %s; serving cached data", status, pkg)
+        return cached["data"]
+    if status == 304 and cached:
+        try: os.utime(path, None)
+        except Exception: pass
+        return cached["data"]
+    if status != 200:
+        raise urllib.error.HTTPError(f"https://{PYPI_HOST}{url_path}", status,
+                                     http.client.responses.get(status, ""), hdrs, None)
+    data = json.loads(body)
+    rec = {"etag": hdrs.get("ETag"), "last_modified": hdrs.get("Last-Modified"), "data": data}
+    try:
+        _write_pypi_cache(path, rec)
+    except Exception as e:
+        LOGGER.warning("PyPI cache write failed for %s: %s", pkg, e)
+    return data
+
+_VER_RE = re.compile(r"(\d+)|([^\d.]+)")
+
+# Rank of a text segment relative to the end of the version: dev < a < b < rc < (end)
+# < post/local/other tags < any further number. So 6.1rc1 < 6.1 < 6.1.post1 < 6.1.2.
+_PRE_TAGS = {"dev": (-2, "dev"), "a": (-1, "a"), "alpha": (-1, "a"), "b": (-1, "b"),
+             "beta": (-1, "b"), "c": (-1, "rc"), "rc": (-1, "rc"), "pre": (-1, "rc"),
+             "preview": (-1, "rc")}
+_VER_END = (0, "")
+
+_EPOCH_RE = re.compile(r"\s*v?(?:(\d+)!)?")
+
+@functools.lru_cache(maxsize=4096)
+def _vkey(v):
+    # numeric runs compare as ints; pre-release tags sort before the end marker, others after.
+    # An "N!" epoch outranks everything, and trailing zeros of the release are dropped
+    # (2.0.0a1 is 2a1, so it sorts below 2.0).
+    v = v.lower()
+    m = _EPOCH_RE.match(v)
+    key = [(2, int(m.group(1) or 0))]
+    release = True
+    for a, b in _VER_RE.findall(v, m.end()):
+        if a:
+            key.append((2, int(a)))
+            continue
+        if release:
+            release = False
+            while len(key) > 2 and key[-1] == (2, 0): key.pop()
+        tag = b.strip("-_")
+        key.append(_PRE_TAGS.get(tag) or (1, tag))
+    if release:
+        while len(key) > 2 and key[-1] == (2, 0): key.pop()
+    key.append(_VER_END)
+    return tuple(key)
+
+def pypi_json_many(pkgs):
+    """{pkg: data} for several packages, fetched concurrently. Fresh cache hits are
+    answered inline; a failed lookup maps to its exception instead of raising."""
+    results, misses = {}, []
+    for pkg in dict.fromkeys(pkgs):
+        data = _fresh_pypi_data(pkg)
+        if data is not None: results[pkg] = data
+        else: misses.append(pkg)
+    if misses:
+        with ThreadPoolExecutor(max_workers=min(8, len(misses))) as ex:
+            futures = {pkg: ex.submit(pypi_json, pkg) for pkg in misses}
+        for pkg, fut in futures.items():
+            try: results[pkg] = fut.result()
+            except Exception as e: results[pkg] = e
+    return results
+
+def _versions_and_info(data):
+    rel = data.get("releases", {})
+    return sorted(rel.keys(), key=_vkey, reverse=True), data.get("info", {})
+
+# sorted (versions, info) per package, so repeat lookups skip the disk cache and the sort
+_PYPI_MEMO = {}
+_PYPI_MEMO_TTL = 300.0
+_PYPI_MEMO_LOCK = threading.Lock()
+
+def _memo_get(pkg):
+    with _PYPI_MEMO_LOCK:
+        hit = _PYPI_MEMO.get(norm(pkg))
+    if hit and time.monotonic() - hit[0] < _PYPI_MEMO_TTL:
+        return hit[1]
+    return None
+
+def _memo_put(pkg, res):
+    with _PYPI_MEMO_LOCK:
+        _PYPI_MEMO[norm(pkg)] = (time.monotonic(), res)
+    return res
 
 def pypi_versions(pkg):
-    data = pypi_json(pkg)
-    rel = data.get("releases", {})
-    def key(v):
-        parts=[]
-        for ch in v.replace("-", ".").split("."):
-            try: parts.append((0,int(ch)))
-            except: parts.append((1,ch))
-        return parts
-    return sorted(list(rel.keys()), key=key, reverse=True), data.get("info", {})
+    return _memo_get(pkg) or _memo_put(pkg, _versions_and_info(pypi_json(pkg)))
+
+def pypi_versions_many(pkgs):
+    """{pkg: (versions, info)} like pypi_versions, with the misses fetched concurrently;
+    a failed lookup maps to its exception."""
+    results, misses = {}, []
+    for pkg in dict.fromkeys(pkgs):
+        hit = _memo_get(pkg)
+        if hit: results[pkg] = hit
+        else: misses.append(pkg)
+    for pkg, data in pypi_json_many(misses).items():
+        results[pkg] = data if isinstance(data, Exception) else _memo_put(pkg, _versions_and_info(data))
+    return results
 
 # ---------- Data & logging locations ----------
 
@@ -132,28 +492,39 @@ DATA_DIR = os.environ.get("BIRDFINGERS_DATA_DIR") or default_log_dir()
 LOG_PATH = os.path.join(DATA_DIR, "birdfingers.log")
 JSONL_PATH = os.path.join(DATA_DIR, "birdfingers_audit.jsonl")
 SNAP_DIR = os.path.join(DATA_DIR, "birdfingers_snapshots")
+PYPI_CACHE_DIR = os.path.join(DATA_DIR, "pypi_cache")
 os.makedirs(SNAP_DIR, exist_ok=True)
 
 def setup_logging():
+    # Request/job threads only enqueue records; a QueueListener thread does the file I/O.
     os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
-    logger = logging.getLogger("birdfingers")
-    logger.setLevel(logging.INFO)
     fh = RotatingFileHandler(LOG_PATH, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
     fh.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
-    logger.addHandler(fh)
-    jlogger = logging.getLogger("birdfingers_json")
-    jlogger.setLevel(logging.INFO)
+    fh.addFilter(logging.Filter("birdfingers"))
     jfh = RotatingFileHandler(JSONL_PATH, maxBytes=1_000_000, backupCount=3, encoding="utf-8")
     jfh.setFormatter(logging.Formatter("%(message)s"))
-    jlogger.addHandler(jfh)
+    jfh.addFilter(logging.Filter("birdfingers_json"))
     ch = logging.StreamHandler()
     ch.setLevel(logging.INFO)
     ch.setFormatter(logging.Formatter("%(message)s"))
-    logger.addHandler(ch)
+    ch.addFilter(logging.Filter("birdfingers"))
+    q = queue.Queue(-1)
+    listener = QueueListener(q, fh, jfh, ch, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger = logging.getLogger("birdfingers")
+    logger.setLevel(logging.INFO)
+    logger.addHandler(QueueHandler(q))
+    jlogger = logging.getLogger("birdfingers_json")
+    jlogger.setLevel(logging.INFO)
+    jlogger.addHandler(QueueHandler(q))
     return logger, jlogger
 
 LOGGER, JLOGGER = setup_logging()
 
+# compact one-line records for the audit JSONL; built once instead of per json.dumps call
+_AUDIT_ENCODE = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
 def log_change(action, status, details, pip_out=""):
     meta = {
         "timestamp": datetime.utcnow().isoformat() + "Z",
@@ -170,24 +541,105 @@ def log_change(action, status, details, pip_out=""):
                 f"code={details.get('returncode','')}")
     if pip_out:
         LOGGER.info("pip output:\n%s", pip_out.strip())
-    JLOGGER.info(json.dumps({**rec, "pip_output": pip_out}, ensure_ascii=False))
+    JLOGGER.info(_AUDIT_ENCODE({**rec, "pip_output": pip_out}))
 
 # ---------- Jobs (streamed output) ----------
 
+JOB_BUFFER_CAP = 2 * 1024 * 1024  # bytes of output kept per job; older output is dropped
+SSE_RETRY_MS = 1000  # reconnect delay sent to EventSource clients
+JOB_POLL_WAIT = 10.0  # seconds a poll request is held open waiting for output
+
+# Bumped and notified whenever any job produces output or finishes, so one long-poll
+# request can wait on several jobs at once.
+_JOBS_CHANGED = threading.Condition()
+_jobs_gen = 0
+
+def _notify_jobs_changed():
+    global _jobs_gen
+    with _JOBS_CHANGED:
+        _jobs_gen += 1
+        _JOBS_CHANGED.notify_all()
+
+def jobs_generation():
+    with _JOBS_CHANGED:
+        return _jobs_gen
+
+def wait_jobs_changed(gen, timeout):
+    """Block until the job generation moves past gen (or timeout); returns the current one."""
+    with _JOBS_CHANGED:
+        _JOBS_CHANGED.wait_for(lambda: _jobs_gen != gen, timeout)
+        return _jobs_gen
+
 class Job:
     def __init__(self, kind, args):
         self.id = uuid.uuid4().hex
         self.kind = kind
         self.args = args
-        self.text = ""
-               # buffered output
+        # buffered output: UTF-8 bytes in a ring that grows up to JOB_BUFFER_CAP
+        self._buf = bytearray()
+        self._head = 0      # index of the oldest byte kept
+        self._size = 0      # bytes currently kept
+        self._seq = 0       # bytes produced since start; clients poll with this as pos
         self.done = False
         self.returncode = None
         self.started = time.time()
         self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)  # notified on new output / completion
     def append(self, s):
-        with self.lock:
-            self.text += s
+        if not s: return
+        b = s.encode("utf-8")
+        with self.cond:
+            self._write(b)
+            self._seq += len(b)
+            self.cond.notify_all()
+        _notify_jobs_changed()
+    def finish(self, returncode):
+        with self.cond:
+            self.returncode = returncode
+            self.done = True
+            self.cond.notify_all()
+        _notify_jobs_changed()
+    def _write(self, b):
+        cap = JOB_BUFFER_CAP
+        if len(b) >= cap:
+            self._buf[:] = b[-cap:]
+            self._head, self._size = 0, cap
+            return
+        grow = min(cap - len(self._buf), len(b))
+        if grow:  # still filling up; head stays 0 until the buffer is full
+            self._buf += b[:grow]
+            self._size += grow
+            b = b[grow:]
+        if b:     # full: overwrite the oldest bytes, which start at head
+            i, n = self._head, len(b)
+            first = min(n, cap - i)
+            self._buf[i:i+first] = b[:first]
+            self._buf[:n-first] = b[first:]
+            self._head = (i + n) % cap
+    def read(self, pos, wait=None):
+        """Output produced after sequence number pos, as (text, new_pos, done, returncode).
+        With wait, block up to that many seconds for new output when there is none yet."""
+        with self.cond:
+            if wait and pos >= self._seq and not self.done:
+                self.cond.wait(wait)
+            oldest = self._seq - self._size
+            start = max(pos, oldest)
+            n = self._seq - start
+            data = b""
+            if n > 0:
+                off = (self._head + start - oldest) % len(self._buf)
+                end = off + n
+                if end <= len(self._buf):
+                    data = bytes(self._buf[off:end])
+                else:
+                    data = bytes(self._buf[off:]) + bytes(self._buf[:end - len(self._buf)])
+            seq, done, rc = self._seq, self.done, self.returncode
+        text = ""
+        if pos < oldest:
+            while data and (data[0] & 0xC0) == 0x80:  # don't start mid-character
+                data = data[1:]
+            text = "[... earlier output dropped ...]\n"
+        return text + data.decode("utf-8", "replace"), seq, done, rc
 
 JOBS = {}
 JOBS_LOCK = threading.Lock()
@@ -202,13 +654,20 @@ def get_job(job_id):
         return JOBS.get(job_id)
 
 def _run_and_stream(job, cmd):
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                         text=True, bufsize=1, universal_newlines=True)
-    for line in p.stdout:
-        job.append(line)
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    # read whatever the pipe has (up to 64 KiB) per syscall; decode like text=True did
+    dec = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(locale.getpreferredencoding(False))("replace"), translate=True)
+    fd = p.stdout.fileno()
+    while True:
+        chunk = os.read(fd, 65536)
+        if not chunk: break
+        job.append(dec.decode(chunk))
+    job.append(dec.decode(b"", final=True))
+    p.stdout.close()
     p.wait()
-    job.returncode = p.returncode
-    job.done = True
+    invalidate_env_caches()
+    job.finish(p.returncode)
 
 def start_job_install_exact(pkg, ver):
     job = Job("install_exact", {"package": pkg, "version": ver})
@@ -241,56 +700,153 @@ def start_job_restore_requirements(req_path):
 
 # ---------- Snapshots, freeze & diff ----------
 
+_FREEZE_CACHE = {"key": None, "text": None, "parsed": None}
+_FREEZE_LOCK = threading.Lock()
+_FREEZE_DIRTY = threading.Event()  # set whenever a job may have changed the environment
+_FREEZE_DIRTY.set()
+
+def invalidate_env_caches():
+    invalidate_list_cache()
+    _FREEZE_DIRTY.set()
+    PIP_WORKER.reset()
+
+# PEP 440 version (packaging's VERSION_PATTERN); pip freeze pins anything else with ===
+_PEP440_RE = re.compile(r"""
+    v?(?:[0-9]+!)?[0-9]+(?:\.[0-9]+)*
+    (?:[-_.]?(?:a|b|c|rc|alpha|beta|pre|preview)[-_.]?[0-9]*)?
+    (?:-[0-9]+|[-_.]?(?:post|rev|r)[-_.]?[0-9]*)?
+    (?:[-_.]?dev[-_.]?[0-9]*)?
+    (?:\+[a-z0-9]+(?:[-_.][a-z0-9]+)*)?
+""", re.VERBOSE | re.IGNORECASE)
+
+def freeze_requirements_fast():
+    """`pip freeze` output built from importlib.metadata, or None when the environment
+    has anything pip would render differently (editable/URL installs, odd versions)."""
+    seen, pins, pip_ver = set(), [], None
+    for d in distributions():
+        try:
+            name = d.metadata["Name"]
+        except Exception:
+            return None
+        if not name: continue
+        canon = norm(name)
+        if canon in seen: continue  # shadowed by an earlier sys.path entry, as in pip
+        seen.add(canon)
+        if d.read_text("direct_url.json") is not None or not _PEP440_RE.fullmatch(d.version or ""):
+            return None
+        if canon == "pip": pip_ver = d.version
+        pins.append((canon, name, d.version))
+    # pip freeze hides itself, and the build backends too before pip 23.1 / Python 3.12
+    skip = {"pip"}
+    if sys.version_info < (3, 12) or (pip_ver and _vkey(pip_ver) < _vkey("23.1")):
+        skip |= {"setuptools", "distribute", "wheel"}
+    # pip orders by name alone; sorting whole "name==ver" lines would put "pytest-cov"
+    # before "pytest" since "-" and "." sort below "="
+    pins.sort(key=lambda t: t[1].lower())
+    return "".join(f"{name}=={ver}\n" for canon, name, ver in pins if canon not in skip)
+
 def freeze_requirements():
-    return pip("freeze").stdout
+    key = _site_key()
+    with _FREEZE_LOCK:
+        if not _FREEZE_DIRTY.is_set() and _FREEZE_CACHE["key"] == key:
+            return _FREEZE_CACHE["text"]
+        _FREEZE_DIRTY.clear()
+        text = freeze_requirements_fast()
+        if text is None:
+            res = pip("freeze")
+            if res.returncode != 0:
+                _FREEZE_DIRTY.set()
+                return res.stdout
+            text = res.stdout
+        _FREEZE_CACHE["key"], _FREEZE_CACHE["text"] = key, text
+        _FREEZE_CACHE["parsed"] = None
+        return text
+
+def current_requirements():
+    """parse_requirements_text(freeze_requirements()), parsed once per freeze."""
+    text = freeze_requirements()
+    with _FREEZE_LOCK:
+        if _FREEZE_CACHE["text"] is text and _FREEZE_CACHE["parsed"] is not None:
+            return _FREEZE_CACHE["parsed"]
+    parsed = parse_requirements_text(text)
+    with _FREEZE_LOCK:
+        if _FREEZE_CACHE["text"] is text:
+            _FREEZE_CACHE["parsed"] = parsed
+    return parsed
+
+# Classifies every line of a requirements/freeze text in one findall: comments and
+# blank lines yield empty groups, name==version pins fill groups 1-2, and anything
+# else (URL/editable/unpinned lines) lands in group 3.
+_REQ_RE = re.compile(r"^[ \t]*(?:#.*|([^\s@=#][^\s@=]*)==(\S+)|(\S.*?))[ \t\r\f\v]*$", re.M)
 
 def parse_requirements_text(text):
     pkgs = {}
     others = []
-    for line in (text or "").splitlines():
-        s = line.strip()
-        if not s or s.startswith("#"):
-            continue
-        if " @ " in s or s.startswith("-e "):
-            others.append(s)
-            continue
-        if "==" in s:
-            name, ver = s.split("==", 1)
-            pkgs[name.lower()] = {"name": name, "version": ver}
-        else:
-            others.append(s)
+    for name, ver, other in _REQ_RE.findall(text or ""):
+        if name:
+            pkgs[norm(name)] = {"name": name, "version": ver}
+        elif other:
+            others.append(other)
     return pkgs, others
 
+@functools.lru_cache(maxsize=32)
+def _parse_requirements_file(path, mtime_ns):
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_requirements_text(f.read())
+
+def parse_requirements_file(path):
+    # snapshot files are written once, so a parse keyed by mtime stays valid
+    return _parse_requirements_file(path, os.stat(path).st_mtime_ns)
+
 def diff_envs(current_pkgs, target_pkgs):
-    installs, uninstalls, unchanged = [], [], []
+    # both sides are {normalized name: pin}, so this is one dict lookup per package
+    installs, unchanged = [], []
     for key, tgt in target_pkgs.items():
         cur = current_pkgs.get(key)
-        if not cur:
-            installs.append({"name": tgt["name"], "from": None, "to": tgt["version"]})
-        elif cur["version"] != tgt["version"]:
-            installs.append({"name": tgt["name"], "from": cur["version"], "to": tgt["version"]})
-        else:
+        if cur and cur["version"] == tgt["version"]:
             unchanged.append({"name": tgt["name"], "version": tgt["version"]})
-    for key, cur in current_pkgs.items():
-        if key not in target_pkgs:
-            uninstalls.append({"name": cur["name"], "from": cur["version"]})
+        else:
+            installs.append({"name": tgt["name"], "from": cur and cur["version"], "to": tgt["version"]})
+    uninstalls = [{"name": cur["name"], "from": cur["version"]}
+                  for key, cur in current_pkgs.items() if key not in target_pkgs]
     return installs, uninstalls, unchanged
 
+def _diff_commands(installs, uninstalls):
+    cmds = []
+    if uninstalls:
+        cmds.append("python -m pip uninstall -y " + " ".join(sorted(x["name"] for x in uninstalls)))
+    for it in installs:
+        cmds.append(f"python -m pip install {it['name']}=={it['to']}")
+    return cmds
+
+_SAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
 def _safe_name(s):
-    s = (s or "").strip() or "snapshot"
-    s = re.sub(r"[^A-Za-z0-9_.-]+", "_", s)
-    return s[:60]
+    return _SAFE_RE.sub("_", (s or "").strip() or "snapshot")[:60]
 
 def save_snapshot(name, comment):
     os.makedirs(SNAP_DIR, exist_ok=True)
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    base = f"{_safe_name(name) or 'snapshot'}_{ts}"
-    req_path = os.path.join(SNAP_DIR, base + ".txt")
-    meta_path = os.path.join(SNAP_DIR, base + ".json")
-
     req_text = freeze_requirements()
     count = len([l for l in req_text.splitlines() if l and not l.startswith("#")])
 
+    # Requests are handled concurrently: two saves within the same second would pick the
+    # same id, so the .txt is claimed with exclusive create and a suffix added on collision.
+    stem = f"{_safe_name(name) or 'snapshot'}_{ts}"
+    for n in range(1, 1000):
+        base = stem if n == 1 else f"{stem}_{n}"
+        req_path = os.path.join(SNAP_DIR, base + ".txt")
+        try:
+            req_file = open(req_path, "x", encoding="utf-8")
+            break
+        except FileExistsError:
+            continue
+        except Exception as e:
+            raise RuntimeError(f"Failed to write snapshot files in {SNAP_DIR}: {e}")
+    else:
+        raise RuntimeError(f"Failed to write snapshot files in {SNAP_DIR}: too many snapshots named {stem}")
+    meta_path = os.path.join(SNAP_DIR, base + ".json")
+
     meta = {
         "id": base,
         "name": name,
@@ -305,27 +861,80 @@ def save_snapshot(name, comment):
     }
 
     try:
-        with open(req_path, "w", encoding="utf-8") as f:
+        with req_file as f:
             f.write(req_text)
         with open(meta_path, "w", encoding="utf-8") as f:
             json.dump(meta, f, ensure_ascii=False, indent=2)
     except Exception as e:
         raise RuntimeError(f"Failed to write snapshot files in {SNAP_DIR}: {e}")
 
+    _update_snap_index(add=(base, meta))
     return meta
 
+# SNAP_DIR/_index.json caches every snapshot's meta so listing is a single read.
+# It records the meta file ids it was built from; if those no longer match the
+# directory (files copied in or removed by hand) it is rebuilt by a parallel scan.
+SNAP_INDEX_NAME = "_index.json"
+_SNAP_LOCK = threading.Lock()
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _snap_ids():
+    with os.scandir(SNAP_DIR) as it:
+        return sorted(e.name[:-5] for e in it
+                      if e.name.endswith(".json") and e.name != SNAP_INDEX_NAME and e.is_file())
+
+def _load_snap_index():
+    idx = _load_json(os.path.join(SNAP_DIR, SNAP_INDEX_NAME))
+    if isinstance(idx, dict) and isinstance(idx.get("ids"), list) and isinstance(idx.get("items"), list):
+        return idx
+    return None
+
+def _write_snap_index(idx):
+    path = os.path.join(SNAP_DIR, SNAP_INDEX_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(idx, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _scan_snapshots(ids):
+    paths = [os.path.join(SNAP_DIR, i + ".json") for i in ids]
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        items = [m for m in ex.map(_load_json, paths) if isinstance(m, dict)]
+    return {"ids": ids, "items": items}
+
+def _update_snap_index(add=None, remove=None):
+    with _SNAP_LOCK:
+        idx = _load_snap_index()
+        if idx is None: return  # rebuilt on the next list_snapshots()
+        if add:
+            idx["ids"] = sorted(set(idx["ids"]) | {add[0]})
+            idx["items"] = [m for m in idx["items"] if m.get("id") != add[0]] + [add[1]]
+        if remove:
+            idx["ids"] = [i for i in idx["ids"] if i != remove]
+            idx["items"] = [m for m in idx["items"] if m.get("id") != remove]
+        try:
+            _write_snap_index(idx)
+        except Exception as e:
+            LOGGER.warning("Snapshot index update failed: %s", e)
+
 def list_snapshots():
     if not os.path.isdir(SNAP_DIR): return []
-    metas = []
-    for name in os.listdir(SNAP_DIR):
-        if name.endswith(".json"):
+    with _SNAP_LOCK:
+        ids = _snap_ids()
+        idx = _load_snap_index()
+        if idx is None or idx["ids"] != ids:
+            idx = _scan_snapshots(ids)
             try:
-                with open(os.path.join(SNAP_DIR, name), "r", encoding="utf-8") as f:
-                    metas.append(json.load(f))
-            except Exception:
-                continue
-    metas.sort(key=lambda m: m.get("created_utc",""), reverse=True)
-    return metas
+                _write_snap_index(idx)
+            except Exception as e:
+                LOGGER.warning("Snapshot index write failed: %s", e)
+    return sorted(idx["items"], key=lambda m: m.get("created_utc",""), reverse=True)
 
 def get_snapshot(id_):
     meta_path = os.path.join(SNAP_DIR, id_ + ".json")
@@ -345,22 +954,16 @@ def delete_snapshot(id_):
             if os.path.exists(p): os.remove(p)
         except Exception:
             ok = False
+    _update_snap_index(remove=id_)
     return ok
 
 def preview_snapshot_vs_current(id_):
     meta, req_path = get_snapshot(id_)
     if not meta: return None
-    with open(req_path, "r", encoding="utf-8") as f:
-        target_text = f.read()
-    target_pkgs, target_other = parse_requirements_text(target_text)
-    cur_text = freeze_requirements()
-    cur_pkgs, cur_other = parse_requirements_text(cur_text)
+    target_pkgs, target_other = parse_requirements_file(req_path)
+    cur_pkgs, cur_other = current_requirements()
     installs, uninstalls, unchanged = diff_envs(cur_pkgs, target_pkgs)
-    cmds = []
-    if uninstalls:
-        cmds.append("python -m pip uninstall -y " + " ".join(sorted(x["name"] for x in uninstalls)))
-    for it in installs:
-        cmds.append(f"python -m pip install {it['name']}=={it['to']}")
+    cmds = _diff_commands(installs, uninstalls)
     return {
         "snapshot": meta,
         "counts": {"install": len(installs), "uninstall": len(uninstalls), "unchanged": len(unchanged),
@@ -374,14 +977,10 @@ def preview_snapshot_vs_snapshot(a_id, b_id):
     a_meta, a_req = get_snapshot(a_id)
     b_meta, b_req = get_snapshot(b_id)
     if not (a_meta and b_meta): return None
-    a_pkgs, a_other = parse_requirements_text(open(a_req,"r",encoding="utf-8").read())
-    b_pkgs, b_other = parse_requirements_text(open(b_req,"r",encoding="utf-8").read())
+    a_pkgs, a_other = parse_requirements_file(a_req)
+    b_pkgs, b_other = parse_requirements_file(b_req)
     installs, uninstalls, unchanged = diff_envs(a_pkgs, b_pkgs)
-    cmds = []
-    if uninstalls:
-        cmds.append("python -m pip uninstall -y " + " ".join(sorted(x["name"] for x in uninstalls)))
-    for it in installs:
-        cmds.append(f"python -m pip install {it['name']}=={it['to']}")
+    cmds = _diff_commands(installs, uninstalls)
     return {
         "a": a_meta, "b": b_meta,
         "counts": {"install": len(installs), "uninstall": len(uninstalls), "unchanged": len(unchanged),
@@ -395,20 +994,23 @@ def preview_snapshot_vs_snapshot(a_id, b_id):
 
 def uninstall(pkg):
     res = pip("uninstall", "-y", pkg)
+    invalidate_env_caches()
     log_change("uninstall", "success" if res.returncode == 0 else "failure",
                {"package": pkg, "returncode": str(res.returncode)}, res.stdout)
     return res
 
 def install_exact_sync(pkg, ver):
-    before = {p["name"]: p["version"] for p in list_installed()}
+    before = {norm(p["name"]): p["version"] for p in list_installed()}
     res = pip("install", f"{pkg}=={ver}")
+    invalidate_env_caches()
     log_change("install_exact", "success" if res.returncode == 0 else "failure",
-               {"package": pkg, "from_version": str(before.get(pkg)),
+               {"package": pkg, "from_version": str(before.get(norm(pkg))),
                 "to_version": ver, "returncode": str(res.returncode)}, res.stdout)
     return res
 
-def show_details(pkg):
-    return pip("show", "-f", pkg)
+def show_details(*pkgs):
+    # pip show takes several names and separates their sections with "---"
+    return pip("show", "-f", *pkgs)
 
 # ---------- Web UI ----------
 
@@ -455,6 +1057,7 @@ INDEX_HTML = """<!doctype html>
   th, td{ text-align:left; padding:10px 12px; border-bottom:1px solid var(--line); }
   thead th{ position:sticky; top: var(--topH); background:var(--card); z-index:1; }
   tr:hover td{ background: rgba(14,165,233,0.08); }
+  tr.vspacer td{ padding:0; border:0; background:none; }
 
   .bottombar{
     position:fixed; left:0; right:0; bottom:0; z-index:5;
@@ -601,13 +1204,53 @@ INDEX_HTML = """<!doctype html>
 <script>
 const $ = s => document.querySelector(s);
 const $$ = s => Array.from(document.querySelectorAll(s));
-const out = msg => { const el = $("#out"); el.textContent += msg + "\\n"; el.scrollTop = el.scrollHeight; };
+/* appends are queued and written (and scrolled to) once per frame, however fast output arrives */
+const outBuf = []; let outPending = false;
+function appendOut(text){
+  if (!text) return;
+  outBuf.push(text);
+  if (outPending) return;
+  outPending = true;
+  requestAnimationFrame(()=>{
+    const el = $("#out");
+    el.append(outBuf.join("")); outBuf.length = 0; outPending = false;
+    el.scrollTop = el.scrollHeight;
+  });
+}
+const out = msg => appendOut(msg + "\\n");
+/* trailing-edge debounce: fn runs once, ms after the last call */
+const debounce = (fn, ms) => { let t = null; return (...a) => { clearTimeout(t); t = setTimeout(() => fn(...a), ms); }; };
+/* selection survives reloads; writes are debounced since localStorage is synchronous */
+let selStateLoaded = false;  // until init() restores it, the empty selection must not be saved
+function writeSelState(){
+  if (!selStateLoaded) return;
+  localStorage.setItem("bf_sel", JSON.stringify([...selected]));
+  localStorage.setItem("bf_active", activePkg || "");
+}
+const saveSelState = debounce(writeSelState, 250);
+window.addEventListener("pagehide", writeSelState);
+function loadSelState(){
+  let names = [];
+  try { names = JSON.parse(localStorage.getItem("bf_sel") || "[]"); } catch (e) {}
+  const installed = new Set(packages.map(p => p.name));
+  selected = new Set((Array.isArray(names) ? names : []).filter(n => installed.has(n)));
+  selStateLoaded = true;
+  return localStorage.getItem("bf_active") || "";
+}
 
 let packages = [];
+/* every assignment goes through here so the filter can use the lowercased name */
+function setPackages(list){
+  packages = list || [];
+  for (const p of packages) p._lc = p.name.toLowerCase();
+}
 let selected = new Set();
 let activePkg = null;
+const versionCache = new Map();  // pkg -> versions (latest first), filled by "Load versions"
 
-let currentJob = null, jobPos = 0, pollTimer = null;
+let currentJob = null, jobStream = null;
+const activeJobs = new Map();  // job_id -> pos, for jobs followed by the batched poller instead of SSE
+let pollBusy = false, pollAbort = null;
 
 /* Fit layout to fixed top/bottom bars */
 function fitBars(){
@@ -626,36 +1269,71 @@ function fitBars(){
 window.addEventListener('load', fitBars);
 window.addEventListener('resize', fitBars);
 
-function startPolling(job_id){
-  currentJob = job_id; jobPos = 0;
+async function jobDone(job_id, rc){
+  if (job_id === currentJob){ currentJob = null; $("#jobState").textContent = "done (" + rc + ")"; }
+  if ($("#viewPackages").style.display !== "none"){ setPackages((await api("/api/list")).packages); renderTable(); }
+  if ($("#viewSnapshots").style.display !== "none"){ loadSnapshots(); }
+}
+/* The current job streams over SSE; a job that was superseded, or whose stream
+   gave up, keeps going through one batched poll shared by all such jobs. */
+function followJob(job_id){
+  if (jobStream){ jobStream.close(); pollJob(jobStream.jobId, jobStream.pos); jobStream = null; }
+  currentJob = job_id;
   $("#jobId").textContent = job_id; $("#jobState").textContent = "running";
-  if (pollTimer) clearInterval(pollTimer);
-  pollTimer = setInterval(async ()=>{
-    try{
-      const r = await fetch("/api/job/poll?"+new URLSearchParams({job_id, pos: String(jobPos)}));
-      if (!r.ok) throw new Error(await r.text());
-      const data = await r.json();
-      if (data.text){ $("#out").textContent += data.text; $("#out").scrollTop = $("#out").scrollHeight; }
-      jobPos = data.pos;
-      if (data.done){
-        $("#jobState").textContent = "done (" + data.returncode + ")";
-        clearInterval(pollTimer); pollTimer = null; currentJob = null;
-        if ($("#viewPackages").style.display !== "none"){ const list = await api("/api/list"); packages = list.packages || []; renderTable(); }
-        if ($("#viewSnapshots").style.display !== "none"){ loadSnapshots(); }
+  if (!window.EventSource) return pollJob(job_id, 0);
+  const es = jobStream = new EventSource("/api/job/stream?"+new URLSearchParams({job_id}));
+  es.jobId = job_id; es.pos = 0;
+  const release = ()=>{ es.close(); if (jobStream === es) jobStream = null; };
+  es.onmessage = (ev)=>{ es.pos = +ev.lastEventId || es.pos; appendOut(JSON.parse(ev.data)); };
+  es.addEventListener("done", (ev)=>{ release(); jobDone(job_id, JSON.parse(ev.data).rc); });
+  // EventSource retries dropped connections by itself (resuming via Last-Event-ID); CLOSED means it gave up
+  es.onerror = ()=>{ if (es.readyState === EventSource.CLOSED){ release(); pollJob(job_id, es.pos); } };
+}
+function pollJob(job_id, pos){
+  activeJobs.set(job_id, pos);
+  if (pollBusy) pollAbort?.abort();  // re-issue the pending poll so it includes this job
+  else pollJobs();
+}
+/* The server holds each poll until a job has output (or ~10 s pass), so the next
+   request goes out as soon as the previous one returns. */
+async function pollJobs(){
+  pollBusy = true;
+  while (activeJobs.size){
+    const ids = [...activeJobs.keys()];
+    pollAbort = new AbortController();
+    try {
+      const r = await api("/api/jobs/poll?"+new URLSearchParams({
+        ids: ids.join(","), pos: ids.map(id => id + ":" + activeJobs.get(id)).join(",")}), {signal: pollAbort.signal});
+      for (const [id, res] of Object.entries(r.results || {})){
+        if (!activeJobs.has(id)) continue;
+        if (res.error){
+          activeJobs.delete(id);
+          if (id === currentJob){ currentJob = null; $("#jobState").textContent = "error"; }
+          continue;
+        }
+        appendOut(res.text); activeJobs.set(id, res.pos);
+        if (res.done){ activeJobs.delete(id); jobDone(id, res.returncode); }
       }
-    }catch(e){
-      $("#jobState").textContent = "error";
-      clearInterval(pollTimer); pollTimer = null; currentJob = null;
+    } catch (e) {
+      // server busy or restarting: back off a little (an abort just means "poll again now")
+      if (e.name !== "AbortError") await new Promise(r => setTimeout(r, 1000));
     }
-  }, 600);
+  }
+  pollBusy = false; pollAbort = null;
 }
 
+function fillVersions(pkg){
+  const sel = $("#verList"); sel.innerHTML = "";
+  (versionCache.get(pkg) || []).forEach(v=>{ const opt = document.createElement("option"); opt.value = v; opt.textContent = v; sel.appendChild(opt); });
+}
 function setActive(pkg){
+  if ((pkg || null) !== activePkg) fillVersions(pkg);
   activePkg = pkg || null;
   $("#activeFor").textContent = activePkg ? `Active: ${activePkg}` : "";
   $$("#chips .chip").forEach(el=>{
     el.style.outline = (el.dataset.pkg === activePkg) ? "2px solid var(--accent)" : "none";
   });
+  saveSelState();
 }
 function renderChips(){
   const box = $("#chips"); box.innerHTML = "";
@@ -671,21 +1349,107 @@ function renderChips(){
     box.appendChild(chip);
   }
   if (!activePkg || !selected.has(activePkg)) setActive(Array.from(selected)[0]);
+  saveSelState();
 }
+/* Windowed rendering for long tables: only the rows near the viewport are in the DOM and
+   two spacer rows stand in for the rest. The page itself scrolls, so the window is worked
+   out from the tbody's position on screen. Short lists are rendered in full. */
+const VIRTUAL_MIN = 200, VIRTUAL_OVERSCAN = 10, ROW_H_GUESS = 40;
+const virtualTables = [];
+function virtualTbody(tbody, rowFor){
+  const spacer = () => {
+    const tr = document.createElement("tr"), td = document.createElement("td");
+    tr.className = "vspacer"; td.colSpan = 99; tr.appendChild(td); return tr;
+  };
+  const top = spacer(), bottom = spacer();
+  let items = [], rowH = 0, frame = 0;
+  function draw(){
+    frame = 0;
+    const n = items.length, virtual = n >= VIRTUAL_MIN;
+    let start = 0, end = n;
+    if (virtual){
+      const h = rowH || ROW_H_GUESS, rect = tbody.getBoundingClientRect();
+      const topH = document.querySelector(".topbar")?.offsetHeight || 0;
+      start = Math.min(n, Math.max(0, Math.floor((topH - rect.top) / h) - VIRTUAL_OVERSCAN));
+      end = Math.min(n, Math.max(start, Math.ceil((window.innerHeight - rect.top) / h) + VIRTUAL_OVERSCAN));
+      top.firstChild.style.height = (start * h) + "px";
+      bottom.firstChild.style.height = ((n - end) * h) + "px";
+    }
+    const want = items.slice(start, end).map(rowFor);
+    if (virtual){ want.unshift(top); want.push(bottom); }
+    if (!tbody.firstChild){
+      // first fill: build off-DOM, attach in one operation
+      const frag = document.createDocumentFragment();
+      for (const tr of want) frag.appendChild(tr);
+      tbody.replaceChildren(frag);
+    } else {
+      // keyed diff: only rows that appear, disappear or move touch the DOM
+      let ref = tbody.firstChild;
+      for (const tr of want){
+        if (tr === ref) ref = ref.nextSibling;
+        else tbody.insertBefore(tr, ref);
+      }
+      while (ref){ const next = ref.nextSibling; ref.remove(); ref = next; }
+    }
+    if (virtual && !rowH && end > start){
+      // measure once the rows are laid out (a hidden tab reports 0: keep guessing)
+      let sum = 0;
+      for (let i = 1; i <= end - start; i++) sum += want[i].offsetHeight;
+      if (sum){ rowH = sum / (end - start); schedule(); }
+    }
+  }
+  function schedule(){
+    if (!frame && (items.length >= VIRTUAL_MIN || top.parentNode)) frame = requestAnimationFrame(draw);
+  }
+  const view = {
+    setItems(list){ items = list; if (frame){ cancelAnimationFrame(frame); frame = 0; } draw(); },
+    schedule,
+    resetRowHeight(){ rowH = 0; },
+  };
+  virtualTables.push(view);
+  return view;
+}
+function scheduleVirtual(){ for (const v of virtualTables) v.schedule(); }
+window.addEventListener("scroll", scheduleVirtual, {passive: true});
+window.addEventListener("resize", ()=>{ for (const v of virtualTables) v.resetRowHeight(); scheduleVirtual(); });
+
+const ROW_ACTIONS = [
+  ["sel", "Select", n => `Add '${n}' to the action row.`],
+  ["details", "Details", n => `Show details for '${n}'.`],
+  ["un", "Uninstall", n => `Uninstall '${n}'.`],
+  ["vers", "Load versions", n => `Load available versions from PyPI for '${n}'.`],
+];
+const rowMap = new Map();   // package name -> its <tr>, reused across renders
+let rowMapFor = null;       // the packages array rowMap was last pruned against
+function buildRow(p){
+  const tr = document.createElement("tr");
+  const name = document.createElement("td"); name.textContent = p.name;
+  const ver = document.createElement("td"); ver.textContent = p.version;
+  const act = document.createElement("td");
+  for (const [cls, label, tip] of ROW_ACTIONS){
+    const b = document.createElement("button");
+    b.className = cls; b.dataset.p = p.name; b.dataset.tip = tip(p.name); b.textContent = label;
+    act.append(b, " ");
+  }
+  tr.append(name, ver, act);
+  return tr;
+}
+/* rows are built on first display and reused; a changed version is patched in place */
+function pkgRow(p){
+  let tr = rowMap.get(p.name);
+  if (!tr){ tr = buildRow(p); rowMap.set(p.name, tr); }
+  else if (tr.cells[1].textContent !== p.version) tr.cells[1].textContent = p.version;
+  return tr;
+}
+const pkgView = virtualTbody($("#tbl tbody"), pkgRow);
 function renderTable() {
   const q = ($("#q").value || "").toLowerCase();
-  const tbody = $("#tbl tbody"); tbody.innerHTML = "";
-  packages.filter(p => p.name.toLowerCase().includes(q)).forEach(p => {
-    const tr = document.createElement("tr");
-    tr.innerHTML = `<td>${p.name}</td><td>${p.version}</td>
-      <td>
-        <button data-p="${p.name}" class="sel" data-tip="Add '${p.name}' to the action row.">Select</button>
-        <button data-p="${p.name}" class="details" data-tip="Show details for '${p.name}'.">Details</button>
-        <button data-p="${p.name}" class="un" data-tip="Uninstall '${p.name}'.">Uninstall</button>
-        <button data-p="${p.name}" class="vers" data-tip="Load available versions from PyPI for '${p.name}'.">Load versions</button>
-      </td>`;
-    tbody.appendChild(tr);
-  });
+  if (rowMapFor !== packages){
+    const names = new Set(packages.map(p => p.name));
+    for (const name of rowMap.keys()) if (!names.has(name)) rowMap.delete(name);
+    rowMapFor = packages;
+  }
+  pkgView.setItems(q ? packages.filter(p => p._lc.includes(q)) : packages);
 }
 function activateTab(which){
   $("#viewPackages").style.display = which === "packages" ? "" : "none";
@@ -696,16 +1460,30 @@ function activateTab(which){
   $("#tabSnapshots").classList.toggle("active", which==="snapshots");
   localStorage.setItem("bf_tab", which);
   fitBars();
+  scheduleVirtual();
 }
+/* GET responses that carry an ETag are kept here and revalidated with If-None-Match */
+const apiCache = new Map();
 async function api(path, opts={}) {
-  const r = await fetch(path, {headers: {'Content-Type':'application/json'}, ...opts});
+  const get = !opts.method || opts.method === "GET";
+  const hit = get ? apiCache.get(path) : null;
+  const headers = {'Content-Type':'application/json'};
+  if (hit) headers["If-None-Match"] = hit.etag;
+  // no-store: the browser cache would otherwise answer the 304 for us and hide it
+  const r = await fetch(path, {headers, ...(get ? {cache:"no-store"} : {}), ...opts});
+  if (hit && r.status === 304) return hit.body;
   if (!r.ok) throw new Error(await r.text());
-  return await r.json();
+  const body = await r.json();
+  const etag = get && r.headers.get("ETag");
+  if (etag) apiCache.set(path, {etag, body});
+  return body;
 }
 async function init() {
   const info = await api("/api/info");
   $("#mode").textContent = info.mode; $("#py").textContent = info.python; $("#port").textContent = info.port;
-  const list = await api("/api/list"); packages = list.packages || []; renderTable(); renderChips();
+  setPackages((await api("/api/list")).packages); renderTable();
+  const active = loadSelState(); renderChips();
+  if (selected.has(active)) setActive(active);
   const tab = localStorage.getItem("bf_tab") || "packages"; activateTab(tab);
   if (tab === "snapshots") loadSnapshots();
   fitBars();
@@ -720,14 +1498,14 @@ async function init() {
 })();
 
 async function reloadPackages(){
-  packages = (await api("/api/list")).packages;
+  setPackages((await api("/api/list")).packages);
   renderTable();
   out("Refreshed.");
 }
 $("#refreshTop").addEventListener("click", reloadPackages);
 $("#refreshPkg").addEventListener("click", reloadPackages);
 
-$("#q").addEventListener("input", renderTable);
+$("#q").addEventListener("input", debounce(renderTable, 150));
 
 document.addEventListener("click", async (e)=>{
   const btn = e.target.closest("button"); if (!btn) return;
@@ -737,13 +1515,13 @@ document.addEventListener("click", async (e)=>{
   if (btn.classList.contains("un")){
     if (!confirm("Uninstall "+pkg+"?")) return;
     const j = await api("/api/job/uninstall_multi", {method:"POST", body:JSON.stringify({packages:[pkg]})});
-    out("Started uninstall job " + j.job_id + " for " + pkg); startPolling(j.job_id); return;
+    out("Started uninstall job " + j.job_id + " for " + pkg); followJob(j.job_id); return;
   }
   if (btn.classList.contains("vers")){
     selected.add(pkg); renderChips(); setActive(pkg); $("#verList").innerHTML = "";
     try{
       const r = await api("/api/versions?"+new URLSearchParams({pkg}));
-      r.versions.forEach(v=>{ const opt = document.createElement("option"); opt.value = v; opt.textContent = v; $("#verList").appendChild(opt); });
+      versionCache.set(pkg, r.versions); fillVersions(pkg);
       out("Loaded versions for "+pkg+" (latest first).");
     } catch(err){ out("Failed to fetch versions for "+pkg+": "+err.message); }
   }
@@ -752,29 +1530,33 @@ $("#clearSel").addEventListener("click", ()=>{ selected.clear(); renderChips();
 
 $("#btnDetails").addEventListener("click", async ()=>{
   if (selected.size === 0) return alert("Select at least one package.");
-  for (const pkg of selected){ const r = await api("/api/show?"+new URLSearchParams({pkg})); out(r.output); }
+  // one request and one pip run for the whole selection
+  const r = await api("/api/show?"+new URLSearchParams([...selected].map(p => ["pkg", p])));
+  out(r.output);
 });
 $("#btnUninstall").addEventListener("click", async ()=>{
   if (selected.size === 0) return alert("Select at least one package.");
   if (!confirm("Uninstall ALL selected packages?")) return;
   const j = await api("/api/job/uninstall_multi", {method:"POST", body:JSON.stringify({packages:[...selected]})});
   out("Started uninstall job " + j.job_id + " for " + selected.size + " package(s).");
-  selected.clear(); renderChips(); startPolling(j.job_id);
+  selected.clear(); renderChips(); followJob(j.job_id);
 });
 $("#btnLoadVersions").addEventListener("click", async ()=>{
   if (!activePkg) return alert("Click a chip to choose the active package first.");
   $("#verList").innerHTML = "";
   try{
-    const r = await api("/api/versions?"+new URLSearchParams({pkg:activePkg}));
-    r.versions.forEach(v=>{ const opt = document.createElement("option"); opt.value = v; opt.textContent = v; $("#verList").appendChild(opt); });
-    out("Loaded versions for "+activePkg+".");
+    const pkg = activePkg;
+    const r = await api("/api/versions?"+new URLSearchParams({pkg}));
+    versionCache.set(pkg, r.versions);
+    if (activePkg === pkg) fillVersions(pkg);
+    out("Loaded versions for "+pkg+".");
   } catch(err){ out("Failed to fetch versions: "+err.message); }
 });
 $("#btnInstall").addEventListener("click", async ()=>{
   if (!activePkg) return alert("Pick an active package (click a chip).");
   const ver = $("#verList").value; if (!ver) return alert("Choose a version.");
   const j = await api("/api/job/install_exact", {method:"POST", body:JSON.stringify({pkg:activePkg, version:ver})});
-  out("Started install job " + j.job_id + " for " + activePkg + "==" + ver); startPolling(j.job_id);
+  out("Started install job " + j.job_id + " for " + activePkg + "==" + ver); followJob(j.job_id);
 });
 
 /* Install tab */
@@ -798,71 +1580,139 @@ $("#btnInstallLatest").addEventListener("click", async ()=>{
   const name = ($("#pkgSearch").value || "").trim(); if (!name) return;
   const vsel = $("#pkgVersions"); const ver = vsel.options.length ? vsel.options[0].value : null;
   const j = await api("/api/job/install_name", {method:"POST", body:JSON.stringify({pkg:name, version:ver})});
-  out("Installing latest " + name + (ver?("=="+ver):"") + " … job " + j.job_id); startPolling(j.job_id);
+  out("Installing latest " + name + (ver?("=="+ver):"") + " … job " + j.job_id); followJob(j.job_id);
 });
 $("#btnInstallChosen").addEventListener("click", async ()=>{
   const name = ($("#pkgSearch").value || "").trim(); if (!name) return;
   const ver = $("#pkgVersions").value || null;
   const j = await api("/api/job/install_name", {method:"POST", body:JSON.stringify({pkg:name, version:ver})});
-  out("Installing " + name + (ver?("=="+ver):"") + " … job " + j.job_id); startPolling(j.job_id);
+  out("Installing " + name + (ver?("=="+ver):"") + " … job " + j.job_id); followJob(j.job_id);
 });
 
 /* Snapshots view */
+const SNAP_ACTIONS = [
+  ["snap-preview", "Preview", "Preview changes vs current environment"],
+  ["snap-restore", "Restore", "Install packages from this snapshot (pip install -r)"],
+  ["snap-view", "View", "View requirements.txt"],
+  ["snap-download", "Download", "Download requirements.txt"],
+  ["snap-delete danger", "Delete", "Delete snapshot"],
+];
+function buildSnapRow(m){
+  const tr = document.createElement("tr");
+  const td = text => { const c = document.createElement("td"); c.textContent = text; tr.appendChild(c); return c; };
+  td(m.name || m.id); td(m.created_utc); td(m.count || "");
+  td((m.comment || "").replace(/\\s+/g," ").slice(0,160)).title = m.comment || "";
+  const act = td("");
+  for (const [cls, label, tip] of SNAP_ACTIONS){
+    const b = document.createElement("button");
+    b.className = cls; b.dataset.id = m.id; b.dataset.tip = tip; b.textContent = label;
+    act.append(b, " ");
+  }
+  return tr;
+}
+const snapRows = new Map();  // snapshot id -> its <tr>, for the current listing
+const snapView = virtualTbody($("#snapTbl tbody"), m => {
+  let tr = snapRows.get(m.id);
+  if (!tr){ tr = buildSnapRow(m); snapRows.set(m.id, tr); }
+  return tr;
+});
 async function loadSnapshots(){
   const data = await api("/api/snapshots");
   const items = data.items || [];
-  const tbody = $("#snapTbl tbody"); tbody.innerHTML = "";
-  items.forEach(m=>{
-    const tr = document.createElement("tr");
-    const comment = (m.comment || "").replace(/\\s+/g," ").slice(0,160);
-    tr.innerHTML = `<td>${m.name || m.id}</td>
-      <td>${m.created_utc}</td>
-      <td>${m.count || ""}</td>
-      <td title="${(m.comment||"").replaceAll('"','&quot;')}">${comment}</td>
-      <td>
-        <button data-id="${m.id}" class="snap-preview" data-tip="Preview changes vs current environment">Preview</button>
-        <button data-id="${m.id}" class="snap-restore" data-tip="Install packages from this snapshot (pip install -r)">Restore</button>
-        <button data-id="${m.id}" class="snap-view" data-tip="View requirements.txt">View</button>
-        <button data-id="${m.id}" class="snap-download" data-tip="Download requirements.txt">Download</button>
-        <button data-id="${m.id}" class="snap-delete danger" data-tip="Delete snapshot">Delete</button>
-      </td>`;
-    tbody.appendChild(tr);
-  });
+  snapRows.clear(); $("#snapTbl tbody").replaceChildren();  // fresh rows: refill via the fragment path
+  snapView.setItems(items);
   // populate A/B selectors
   const selA = $("#diffA"), selB = $("#diffB");
   [selA, selB].forEach(sel => {
-    sel.innerHTML = "";
+    const opts = document.createDocumentFragment();
     items.forEach(m=>{
       const o=document.createElement("option");
-      o.value=m.id; o.textContent=m.name||m.id; sel.appendChild(o);
+      o.value=m.id; o.textContent=m.name||m.id; opts.appendChild(o);
     });
+    sel.replaceChildren(opts);
   });
 }
 $("#refreshSnaps").addEventListener("click", loadSnapshots);
 
+/* Turns a snapshot view/preview/diff response into output text (null when it is an error).
+   It must stay self-contained: its source is also what runs inside the snapshot worker. */
+function formatSnapResult(kind, r, id){
+  if (!r || r.error) return null;
+  if (kind === "view") return "----- requirements for "+id+" -----\\n"+r.text+"\\n--------------------";
+  const lines = [];
+  if (kind === "preview"){
+    lines.push("=== Preview vs current ===");
+    lines.push(`Snapshot: ${r.snapshot.id}  (${r.counts.install} install / ${r.counts.uninstall} uninstall / ${r.counts.unchanged} unchanged)`);
+  } else {
+    lines.push("=== Diff: A -> B ===");
+    lines.push(`A=${r.a.id}  B=${r.b.id}  (${r.counts.install} install / ${r.counts.uninstall} uninstall / ${r.counts.unchanged} unchanged)`);
+  }
+  if (r.installs.length){ lines.push("Install/upgrade:"); r.installs.forEach(x=>lines.push(`  - ${x.name}: ${x.from||'∅'} -> ${x.to}`)); }
+  if (r.uninstalls.length){ lines.push("Uninstall:"); r.uninstalls.forEach(x=>lines.push(`  - ${x.name} (${x.from})`)); }
+  if (r.commands.length){ lines.push("Commands:"); r.commands.forEach(c=>lines.push("  " + c)); }
+  lines.push(r.notes);
+  return lines.join("\\n");
+}
+/* Snapshot responses can be large: parse and format them in a worker built from
+   formatSnapResult's source; if workers are unavailable, do it on the main thread. */
+let snapWorker;  // undefined: not created yet, null: unavailable
+const snapCalls = new Map(); let snapSeq = 0;
+function formatInline(c){
+  try { return formatSnapResult(c.kind, JSON.parse(c.text), c.id); } catch (e) { return null; }
+}
+function getSnapWorker(){
+  if (snapWorker !== undefined) return snapWorker;
+  try {
+    const src = formatSnapResult.toString() + `
+onmessage = (e)=>{
+  const {seq, kind, text, id} = e.data; let res = null;
+  try { res = formatSnapResult(kind, JSON.parse(text), id); } catch (err) {}
+  postMessage({seq, res});
+};`;
+    snapWorker = new Worker(URL.createObjectURL(new Blob([src], {type:"application/javascript"})));
+    snapWorker.onmessage = (e)=>{
+      const c = snapCalls.get(e.data.seq); snapCalls.delete(e.data.seq);
+      if (c) c.resolve(e.data.res);
+    };
+    // e.g. blob: workers blocked by policy: finish what is pending inline and stop using it
+    snapWorker.onerror = ()=>{
+      snapWorker = null;
+      for (const c of snapCalls.values()) c.resolve(formatInline(c));
+      snapCalls.clear();
+    };
+  } catch (e) { snapWorker = null; }
+  return snapWorker;
+}
+async function fetchSnapText(kind, path, id){
+  let text;
+  try {
+    const r = await fetch(path);
+    if (!r.ok) return null;
+    text = await r.text();
+  } catch (e) { return null; }
+  const w = getSnapWorker();
+  if (!w) return formatInline({kind, text, id});
+  return new Promise(resolve => {
+    const seq = ++snapSeq;
+    snapCalls.set(seq, {resolve, kind, text, id});
+    w.postMessage({seq, kind, text, id});
+  });
+}
 document.addEventListener("click", async (e)=>{
   const b = e.target.closest("button"); if (!b) return;
   if (b.classList.contains("snap-preview")){
     const id = b.getAttribute("data-id");
-    const r = await api("/api/snapshot/preview?"+new URLSearchParams({id}));
-    if (!r || r.error){ out("Preview failed."); return; }
-    const lines = [];
-    lines.push("=== Preview vs current ===");
-    lines.push(`Snapshot: ${r.snapshot.id}  (${r.counts.install} install / ${r.counts.uninstall} uninstall / ${r.counts.unchanged} unchanged)`);
-    if (r.installs.length){ lines.push("Install/upgrade:"); r.installs.forEach(x=>lines.push(`  - ${x.name}: ${x.from||'∅'} -> ${x.to}`)); }
-    if (r.uninstalls.length){ lines.push("Uninstall:"); r.uninstalls.forEach(x=>lines.push(`  - ${x.name} (${x.from})`)); }
-    if (r.commands.length){ lines.push("Commands:"); r.commands.forEach(c=>lines.push("  " + c)); }
-    lines.push(r.notes);
-    out(lines.join("\\n"));
+    const text = await fetchSnapText("preview", "/api/snapshot/preview?"+new URLSearchParams({id}), id);
+    out(text === null ? "Preview failed." : text);
   } else if (b.classList.contains("snap-restore")){
     const id = b.getAttribute("data-id");
     if (!confirm("Restore snapshot "+id+"? This may change many packages.")) return;
     const j = await api("/api/job/restore", {method:"POST", body:JSON.stringify({id})});
-    out("Started restore job " + j.job_id + " for snapshot " + id); startPolling(j.job_id);
+    out("Started restore job " + j.job_id + " for snapshot " + id); followJob(j.job_id);
   } else if (b.classList.contains("snap-view")){
     const id = b.getAttribute("data-id");
-    const r = await api("/api/snapshot/view?"+new URLSearchParams({id}));
-    out("----- requirements for "+id+" -----\\n"+r.text+"\\n--------------------");
+    const text = await fetchSnapText("view", "/api/snapshot/view?"+new URLSearchParams({id}), id);
+    out(text === null ? "View failed." : text);
   } else if (b.classList.contains("snap-download")){
     const id = b.getAttribute("data-id"); window.open("/api/snapshot/download?"+new URLSearchParams({id}), "_blank");
   } else if (b.classList.contains("snap-delete")){
@@ -873,16 +1723,8 @@ document.addEventListener("click", async (e)=>{
 });
 $("#btnDiffAB").addEventListener("click", async ()=>{
   const a = $("#diffA").value, b = $("#diffB").value; if (!a || !b) return;
-  const r = await api("/api/snapshot/diff?"+new URLSearchParams({a, b}));
-  if (!r || r.error){ out("Diff failed."); return; }
-  const lines = [];
-  lines.push("=== Diff: A -> B ===");
-  lines.push(`A=${r.a.id}  B=${r.b.id}  (${r.counts.install} install / ${r.counts.uninstall} uninstall / ${r.counts.unchanged} unchanged)`);
-  if (r.installs.length){ lines.push("Install/upgrade:"); r.installs.forEach(x=>lines.push(`  - ${x.name}: ${x.from||'∅'} -> ${x.to}`)); }
-  if (r.uninstalls.length){ lines.push("Uninstall:"); r.uninstalls.forEach(x=>lines.push(`  - ${x.name} (${x.from})`)); }
-  if (r.commands.length){ lines.push("Commands:"); r.commands.forEach(c=>lines.push("  " + c)); }
-  lines.push(r.notes);
-  out(lines.join("\\n"));
+  const text = await fetchSnapText("diff", "/api/snapshot/diff?"+new URLSearchParams({a, b}));
+  out(text === null ? "Diff failed." : text);
 });
 
 /* Save snapshot (wired) */
@@ -925,122 +1767,266 @@ def env_info():
         "log_path": LOG_PATH,
     }
 
-def json_response(handler, obj, code=200, ctype="application/json; charset=utf-8"):
-    data = (json.dumps(obj) if isinstance(obj, (dict,list)) else str(obj)).encode("utf-8")
-    handler.send_response(code)
-    handler.send_header("Content-Type", ctype)
-    handler.send_header("Content-Length", str(len(data)))
+def _etag(data):
+    return '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+
+def _etag_matches(handler, etag):
+    # weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored on both sides
+    inm = handler.headers.get("If-None-Match")
+    if not inm: return False
+    bare = lambda t: t[2:] if t.startswith("W/") else t
+    tags = {bare(t.strip()) for t in inm.split(",")}
+    return "*" in tags or bare(etag) in tags
+
+def send_not_modified(handler, etag):
+    handler.send_response(304)
+    handler.send_header("ETag", etag)
+    handler.send_header("Cache-Control", "no-cache")
     handler.end_headers()
-    handler.wfile.write(data)
+
+GZIP_MIN_BYTES = 1024  # smaller bodies are sent as-is
+
+def _accepts_gzip(handler):
+    return "gzip" in handler.headers.get("Accept-Encoding", "")
+
+# the UI page never changes at runtime: encode, compress and tag it once
+_INDEX_BYTES = INDEX_HTML.encode("utf-8")
+_INDEX_GZ = gzip.compress(_INDEX_BYTES, 6)
+_INDEX_ETAG = _etag(_INDEX_BYTES)
+
+_JSON_ENCODE = json.JSONEncoder(separators=(",", ":")).encode
+
+def _write_response(handler, code, headers, body):
+    # status line, headers and body in one write; send_response/end_headers would
+    # flush the headers on their own and leave the body to a second send
+    handler.log_request(code)
+    head = [f"{handler.protocol_version} {code} {handler.responses.get(code, ('',))[0]}",
+            f"Server: {handler.version_string()}", f"Date: {handler.date_time_string()}"]
+    head += [f"{k}: {v}" for k, v in headers]
+    head.append(f"Content-Length: {len(body)}")
+    handler.wfile.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+def json_response(handler, obj, code=200, ctype="application/json; charset=utf-8", etag=None):
+    # obj may also be an already-serialised body (bytes)
+    if isinstance(obj, dict): data = _JSON_ENCODE(obj).encode("utf-8")
+    elif isinstance(obj, bytes): data = obj
+    else: data = (_JSON_ENCODE(obj) if isinstance(obj, list) else str(obj)).encode("utf-8")
+    big = len(data) > GZIP_MIN_BYTES
+    gz = big and _accepts_gzip(handler)
+    if gz: data = gzip.compress(data, 1)  # level 1: most of the gain for JSON at little CPU
+    headers = [("Content-Type", ctype)]
+    if gz: headers.append(("Content-Encoding", "gzip"))
+    if big: headers.append(("Vary", "Accept-Encoding"))
+    if etag: headers += [("ETag", etag), ("Cache-Control", "no-cache")]
+    _write_response(handler, code, headers, data)
 
 class App(BaseHTTPRequestHandler):
     def do_GET(self):
-        if self.path == "/" or self.path.startswith("/index.html"):
-            body = INDEX_HTML.encode("utf-8")
-            self.send_response(200)
-            self.send_header("Content-Type", "text/html; charset=utf-8")
-            self.send_header("Content-Length", str(len(body)))
-            self.end_headers()
-            self.wfile.write(body); return
-
-        if self.path.startswith("/api/info"):
-            return json_response(self, env_info())
-
-        if self.path.startswith("/api/paths"):
-            return json_response(self, {
-                "data_dir": DATA_DIR,
-                "snap_dir": SNAP_DIR,
-                "log_path": LOG_PATH,
-                "python": sys.executable
-            })
-
-        if self.path.startswith("/api/list"):
-            return json_response(self, {"packages": list_installed()})
-
-        if self.path.startswith("/api/versions"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            pkg = (qs.get("pkg") or [""])[0]
-            try:
-                vers, _ = pypi_versions(pkg)
-                return json_response(self, {"versions": vers})
-            except Exception as e:
-                return json_response(self, {"error": str(e)}, 500)
-
-        if self.path.startswith("/api/pypi/info"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            pkg = (qs.get("pkg") or [""])[0]
-            try:
-                vers, info = pypi_versions(pkg)
-                latest = vers[0] if vers else None
-                info_out = {"name": info.get("name"), "summary": info.get("summary"),
-                            "requires_python": info.get("requires_python")}
-                return json_response(self, {"versions": vers, "latest": latest, "info": info_out})
-            except urllib.error.HTTPError as e:
-                if e.code == 404:
-                    return json_response(self, {"error": "not found"}, 404)
-                return json_response(self, {"error": str(e)}, 500)
-
-        if self.path.startswith("/api/show"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            pkg = (qs.get("pkg") or [""])[0]
-            res = show_details(pkg)
-            return json_response(self, {"output": res.stdout})
-
-        if self.path.startswith("/api/snapshots"):
-            return json_response(self, {"items": list_snapshots()})
-
-        if self.path.startswith("/api/snapshot/view"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            sid = (qs.get("id") or [""])[0]
-            meta, req_path = get_snapshot(sid)
-            if not meta: return json_response(self, {"error":"not found"}, 404)
-            with open(req_path, "r", encoding="utf-8") as f:
-                txt = f.read()
-            return json_response(self, {"text": txt})
-
-        if self.path.startswith("/api/snapshot/download"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            sid = (qs.get("id") or [""])[0]
-            meta, req_path = get_snapshot(sid)
-            if not meta: self.send_error(404); return
-            with open(req_path, "rb") as f:
-                data = f.read()
-            self.send_response(200)
-            self.send_header("Content-Type", "text/plain; charset=utf-8")
-            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(req_path)}"')
-            self.send_header("Content-Length", str(len(data)))
-            self.end_headers()
-            self.wfile.write(data)
-            return
+        url = urllib.parse.urlsplit(self.path)
+        self._query, self._qs_cache = url.query, None
+        route = self.GET_ROUTES.get(url.path)
+        if route is None:
+            return self.send_error(404)
+        return route(self)
+
+    def _qs(self):
+        # the current request's query, parsed on first use
+        if self._qs_cache is None:
+            self._qs_cache = urllib.parse.parse_qs(self._query)
+        return self._qs_cache
+
+    def _arg(self, name, default=""):
+        return (self._qs().get(name) or [default])[0]
+
+    def get_index(self):
+        if _etag_matches(self, _INDEX_ETAG):
+            return send_not_modified(self, _INDEX_ETAG)
+        gz = _accepts_gzip(self)
+        body = _INDEX_GZ if gz else _INDEX_BYTES
+        headers = [("Content-Type", "text/html; charset=utf-8")]
+        if gz: headers.append(("Content-Encoding", "gzip"))
+        headers += [("Vary", "Accept-Encoding"), ("ETag", _INDEX_ETAG), ("Cache-Control", "no-cache")]
+        return _write_response(self, 200, headers, body)
+
+    def get_info(self):
+        return json_response(self, env_info())
+
+    def get_paths(self):
+        return json_response(self, {
+            "data_dir": DATA_DIR,
+            "snap_dir": SNAP_DIR,
+            "log_path": LOG_PATH,
+            "python": sys.executable
+        })
+
+    def get_list(self):
+        body, etag = list_installed_json()
+        if _etag_matches(self, etag):
+            return send_not_modified(self, etag)
+        return json_response(self, body, etag=etag)
+
+    def get_versions(self):
+        try:
+            vers, _ = pypi_versions(self._arg("pkg"))
+            return json_response(self, {"versions": vers})
+        except Exception as e:
+            return json_response(self, {"error": str(e)}, 500)
 
-        if self.path.startswith("/api/snapshot/preview"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            sid = (qs.get("id") or [""])[0]
-            data = preview_snapshot_vs_current(sid)
-            if not data: return json_response(self, {"error":"not found"}, 404)
-            return json_response(self, data)
-
-        if self.path.startswith("/api/snapshot/diff"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            a = (qs.get("a") or [""])[0]; b = (qs.get("b") or [""])[0]
-            data = preview_snapshot_vs_snapshot(a, b)
-            if not data: return json_response(self, {"error":"not found"}, 404)
-            return json_response(self, data)
-
-        if self.path.startswith("/api/job/poll"):
-            qs = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
-            jid = (qs.get("job_id") or [""])[0]
-            pos = int((qs.get("pos") or ["0"])[0])
-            job = get_job(jid)
-            if not job: return json_response(self, {"error":"job not found"}, 404)
-            with job.lock:
-                text = job.text[pos:] if pos < len(job.text) else ""
-                newpos = len(job.text)
-                done = job.done
-                rc = job.returncode
-            return json_response(self, {"text": text, "pos": newpos, "done": done, "returncode": rc})
+    def get_pypi_info(self):
+        try:
+            vers, info = pypi_versions(self._arg("pkg"))
+            latest = vers[0] if vers else None
+            info_out = {"name": info.get("name"), "summary": info.get("summary"),
+                        "requires_python": info.get("requires_python")}
+            return json_response(self, {"versions": vers, "latest": latest, "info": info_out})
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return json_response(self, {"error": "not found"}, 404)
+            return json_response(self, {"error": str(e)}, 500)
+
+    def get_pypi_batch(self):
+        results = {}
+        for pkg, res in pypi_versions_many([p for p in self._qs().get("pkg", []) if p]).items():
+            if isinstance(res, Exception):
+                results[pkg] = {"error": str(res)}
+            else:
+                vers = res[0]
+                results[pkg] = {"versions": vers, "latest": vers[0] if vers else None}
+        return json_response(self, {"results": results})
+
+    def get_show(self):
+        res = show_details(*([p for p in self._qs().get("pkg", []) if p] or [""]))
+        return json_response(self, {"output": res.stdout})
+
+    def get_snapshots(self):
+        body = _JSON_ENCODE({"items": list_snapshots()}).encode("utf-8")
+        etag = _etag(body)
+        if _etag_matches(self, etag):
+            return send_not_modified(self, etag)
+        return json_response(self, body, etag=etag)
+
+    def get_snapshot_view(self):
+        meta, req_path = get_snapshot(self._arg("id"))
+        if not meta: return json_response(self, {"error":"not found"}, 404)
+        with open(req_path, "r", encoding="utf-8") as f:
+            txt = f.read()
+        return json_response(self, {"text": txt})
+
+    def get_snapshot_download(self):
+        meta, req_path = get_snapshot(self._arg("id"))
+        if not meta: self.send_error(404); return
+        with open(req_path, "rb") as f:
+            data = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(req_path)}"')
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def get_snapshot_preview(self):
+        data = preview_snapshot_vs_current(self._arg("id"))
+        if not data: return json_response(self, {"error":"not found"}, 404)
+        return json_response(self, data)
+
+    def get_snapshot_diff(self):
+        data = preview_snapshot_vs_snapshot(self._arg("a"), self._arg("b"))
+        if not data: return json_response(self, {"error":"not found"}, 404)
+        return json_response(self, data)
+
+    def _release_slot(self):
+        # long-lived responses don't count against the server's thread cap
+        release = getattr(self.server, "release_slot", None)
+        if release: release()
+
+    def get_job_poll(self):
+        self._release_slot()
+        pos = int(self._arg("pos", "0"))
+        job = get_job(self._arg("job_id"))
+        if not job: return json_response(self, {"error":"job not found"}, 404)
+        # long-poll: held until there is output past pos, the job ends, or JOB_POLL_WAIT
+        text, newpos, done, rc = job.read(pos, wait=JOB_POLL_WAIT)
+        return json_response(self, {"text": text, "pos": newpos, "done": done, "returncode": rc})
+
+    def get_jobs_poll(self):
+        self._release_slot()
+        # several jobs in one request: ids=a,b&pos=a:N,b:M
+        ids = [j for j in self._arg("ids").split(",") if j]
+        pos = {}
+        for item in self._arg("pos").split(","):
+            jid, _, n = item.rpartition(":")
+            if jid and n.isdigit(): pos[jid] = int(n)
+        # long-poll as well: answer once any listed job has news, or after JOB_POLL_WAIT
+        deadline = time.monotonic() + JOB_POLL_WAIT
+        gen = jobs_generation()
+        while True:
+            results, news = {}, False
+            for jid in ids:
+                job = get_job(jid)
+                if not job:
+                    results[jid] = {"error": "job not found"}
+                    news = True
+                    continue
+                text, newpos, done, rc = job.read(pos.get(jid, 0))
+                results[jid] = {"text": text, "pos": newpos, "done": done, "returncode": rc}
+                news = news or bool(text) or done
+            left = deadline - time.monotonic()
+            if news or not ids or left <= 0:
+                return json_response(self, {"results": results})
+            gen = wait_jobs_changed(gen, left)
+
+    def get_job_stream(self):
+        job = get_job(self._arg("job_id"))
+        if not job: return json_response(self, {"error":"job not found"}, 404)
+        self._release_slot()
+        return self.stream_job(job)
+
+    # exact path -> handler; the query string is left to _qs()/_arg()
+    GET_ROUTES = {
+        "/": get_index,
+        "/index.html": get_index,
+        "/api/info": get_info,
+        "/api/paths": get_paths,
+        "/api/list": get_list,
+        "/api/versions": get_versions,
+        "/api/pypi/info": get_pypi_info,
+        "/api/pypi/batch": get_pypi_batch,
+        "/api/show": get_show,
+        "/api/snapshots": get_snapshots,
+        "/api/snapshot/view": get_snapshot_view,
+        "/api/snapshot/download": get_snapshot_download,
+        "/api/snapshot/preview": get_snapshot_preview,
+        "/api/snapshot/diff": get_snapshot_diff,
+        "/api/job/poll": get_job_poll,
+        "/api/jobs/poll": get_jobs_poll,
+        "/api/job/stream": get_job_stream,
+    }
 
-        self.send_error(404)
+    def stream_job(self, job):
+        # Server-Sent Events: one event per output delta, `id` is the text offset so
+        # EventSource reconnects resume via Last-Event-ID; a final `done` event carries rc.
+        try:
+            pos = int(self.headers.get("Last-Event-ID") or 0)
+        except ValueError:
+            pos = 0
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            # reconnect after 1 s instead of the browser default (~3 s) if the stream drops
+            self.wfile.write(f"retry: {SSE_RETRY_MS}\n\n".encode("ascii"))
+            while True:
+                text, pos, done, rc = job.read(pos, wait=15)
+                if text:
+                    self.wfile.write(f"id: {pos}\ndata: {json.dumps(text)}\n\n".encode("utf-8"))
+                elif not done:
+                    self.wfile.write(b": keep-alive\n\n")
+                if done:
+                    self.wfile.write(f"event: done\ndata: {json.dumps({'rc': rc})}\n\n".encode("utf-8"))
+                    return
+        except ConnectionError:  # client went away (Broken pipe, reset, or aborted on Windows)
+            return
 
     def do_POST(self):
         n = int(self.headers.get("Content-Length", "0") or "0")
@@ -1102,11 +2088,44 @@ class App(BaseHTTPRequestHandler):
 
         self.send_error(404)
 
+class BoundedThreadingHTTPServer(ThreadingHTTPServer):
+    # one daemon thread per request, but never more than max_threads at once;
+    # further connections wait in the accept backlog until a slot frees up.
+    # Streams and long-polls idle for seconds at a time, so they hand their slot
+    # back (release_slot) instead of starving ordinary requests.
+    daemon_threads = True
+    max_threads = 16
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = threading.BoundedSemaphore(self.max_threads)
+        self._held = threading.local()  # whether this handler thread still holds its slot
+
+    def release_slot(self):
+        if getattr(self._held, "slot", False):
+            self._held.slot = False
+            self._slots.release()
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        self._held.slot = True
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.release_slot()
+
 def serve(open_browser=True, port=8765):
     global SERVER_PORT
     SERVER_PORT = port
     addr = ("127.0.0.1", port)
-    httpd = HTTPServer(addr, App)
+    httpd = BoundedThreadingHTTPServer(addr, App)
     url = f"http://{addr[0]}:{addr[1]}/"
     LOGGER.info("Birdfingers UI on %s", url)
     if open_browser: